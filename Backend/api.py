@@ -4,17 +4,21 @@ Pixella - AI-Powered Image Authenticity Protocol
 FastAPI Server
 """
 
+import io
 import os
-import json
+import sys
 import logging
 import tempfile
 import asyncio
+from contextlib import asynccontextmanager
 from typing import Dict, Any, Optional
 from pathlib import Path
 from datetime import datetime
+import aiofiles
+import orjson
 from dotenv import load_dotenv
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, BackgroundTasks, Request
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
@@ -31,11 +35,27 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Upload limits
+MAX_UPLOAD_SIZE = int(os.getenv('MAX_IMAGE_SIZE', 10485760))
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# os.sendfile only accepts a regular file as destination on Linux
+SENDFILE_TO_FILE = sys.platform.startswith("linux")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the shared client on startup"""
+    # Client components are built lazily, so startup stays cheap
+    app.state.client = PixellaClient()
+    yield
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Pixella API",
     description="AI-Powered Image Authenticity Protocol with Filecoin Storage",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -64,10 +84,88 @@ class VerificationResponse(BaseModel):
     verification_url: str
     timestamp: str
 
-# Global client instance
-pixella_client = PixellaClient()
-
 # Helper functions
+def upload_in_memory(file: UploadFile) -> Optional[bool]:
+    """Whether Starlette still holds an upload in memory, or None if that can't be told"""
+    # Only place reading UploadFile/SpooledTemporaryFile internals; unknown means stream the upload
+    in_memory = getattr(file, "_in_memory", None)
+    if in_memory is None:
+        rolled = getattr(file.file, "_rolled", None)
+        in_memory = None if rolled is None else not rolled
+    return in_memory
+
+def upload_memory_buffer(file: UploadFile) -> Optional[io.BytesIO]:
+    """Return the buffer of an upload Starlette still holds in memory, else None"""
+    if upload_in_memory(file) is not True:
+        return None
+    buffer = getattr(file.file, "_file", None)
+    return buffer if isinstance(buffer, io.BytesIO) else None
+
+def upload_fileno(file: UploadFile) -> Optional[int]:
+    """Return the file descriptor backing an upload if it lives on disk"""
+    # Uploads still held in memory (or of unknown state) have no usable descriptor
+    if upload_in_memory(file) is not False:
+        return None
+    try:
+        return file.file.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+def sendfile_copy(src_fd: int, dst_path: str, size: int) -> int:
+    """Copy an on-disk upload to dst_path without a userspace buffer"""
+    offset = 0
+    with open(dst_path, "wb") as dst:
+        while offset < size:
+            sent = os.sendfile(dst.fileno(), src_fd, offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+    return offset
+
+def write_buffer(dst_path: str, view: memoryview) -> int:
+    """Write an in-memory upload to dst_path in a single call"""
+    with open(dst_path, "wb") as dst:
+        return dst.write(view)
+
+def upload_too_large() -> HTTPException:
+    """Build the error raised when an upload exceeds MAX_UPLOAD_SIZE"""
+    return HTTPException(status_code=413, detail={
+        "error": "file_too_large",
+        "message": f"File exceeds maximum size of {MAX_UPLOAD_SIZE} bytes"
+    })
+
+async def save_upload(file: UploadFile, temp_path: str) -> int:
+    """Write an upload to temp_path and return the number of bytes written"""
+    src_fd = upload_fileno(file) if SENDFILE_TO_FILE else None
+    if src_fd is not None:
+        # Upload already rolled to disk: let the kernel copy it
+        size = os.fstat(src_fd).st_size
+        if size > MAX_UPLOAD_SIZE:
+            raise upload_too_large()
+        try:
+            return await asyncio.to_thread(sendfile_copy, src_fd, temp_path, size)
+        except OSError as e:
+            # sendfile offsets leave the upload position untouched, so streaming can start over
+            logger.warning("sendfile failed, streaming upload instead: %s", e)
+    
+    buffer = upload_memory_buffer(file)
+    if buffer is not None:
+        # Upload still in memory: write it out in one go without chunk copies
+        with buffer.getbuffer() as view:
+            if len(view) > MAX_UPLOAD_SIZE:
+                raise upload_too_large()
+            return await asyncio.to_thread(write_buffer, temp_path, view)
+    
+    # Otherwise stream file content to temp file in chunks
+    total_size = 0
+    async with aiofiles.open(temp_path, "wb") as temp_file:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            total_size += len(chunk)
+            if total_size > MAX_UPLOAD_SIZE:
+                raise upload_too_large()
+            await temp_file.write(chunk)
+    return total_size
+
 def result_to_response(result: PixellaResult) -> Dict[str, Any]:
     """Convert PixellaResult to API response format"""
     return {
@@ -101,6 +199,7 @@ async def root():
 
 @app.post("/verify", response_model=VerificationResponse)
 async def verify_image(
+    request: Request,
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     metadata: Optional[str] = Form(None)
@@ -110,8 +209,8 @@ async def verify_image(
     try:
         # Parse metadata if provided
         try:
-            user_metadata = json.loads(metadata) if metadata else {}
-        except json.JSONDecodeError:
+            user_metadata = orjson.loads(metadata) if metadata else {}
+        except orjson.JSONDecodeError:
             logger.error("Invalid metadata JSON format")
             raise HTTPException(status_code=400, detail={
                 "error": "invalid_metadata",
@@ -130,58 +229,64 @@ async def verify_image(
         if not file_ext:
             file_ext = ".jpg"  # Default extension if none provided
             
-        temp_path = tempfile.mktemp(suffix=file_ext)
+        with tempfile.NamedTemporaryFile(suffix=file_ext, delete=False) as temp_file:
+            temp_path = temp_file.name
         
-        # Read file content and write to temp file
+        # Copy file content to temp file
         try:
-            content = await file.read()
-            if not content:
+            total_size = await save_upload(file, temp_path)
+            if total_size == 0:
                 raise HTTPException(status_code=400, detail={
                     "error": "empty_file",
                     "message": "Empty file uploaded"
                 })
-                
-            with open(temp_path, "wb") as temp_file:
-                temp_file.write(content)
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"File read/write error: {e}")
+            logger.error("File read/write error: %s", e)
             raise HTTPException(status_code=400, detail={
                 "error": "file_io_error",
                 "message": f"Error reading or writing file: {str(e)}"
             })
         
         # Process image
-        logger.info(f"Processing uploaded image: {file.filename} (saved to {temp_path})")
+        logger.info("Processing uploaded image: %s (saved to %s)", file.filename, temp_path)
         try:
             # Note: Currently the client doesn't support metadata as a parameter
-            result = await pixella_client.process_image(temp_path)
+            client = request.app.state.client
+            result = await client.process_image_sync(temp_path)
+            # Clean up temp file once the response is sent; anchoring only needs the result
+            background_tasks.add_task(os.unlink, temp_path)
+            # Anchor on blockchain and Filecoin after responding; poll GET /verify/{image_hash} for tx/CID
+            background_tasks.add_task(client.process_image_anchor, result)
             # Return result
             return result_to_response(result)
         except ValueError as e:
             # Handle validation errors (format, size, etc.)
-            logger.error(f"Validation error: {e}")
+            logger.error("Validation error: %s", e)
             raise HTTPException(status_code=400, detail={
                 "error": "validation_error",
                 "message": str(e)
             })
         except FileNotFoundError as e:
             # Should not happen but handle just in case
-            logger.error(f"File not found: {e}")
+            logger.error("File not found: %s", e)
             raise HTTPException(status_code=404, detail={
                 "error": "file_not_found",
                 "message": str(e)
             })
         except Exception as e:
             # Handle other processing errors
-            logger.error(f"Processing error: {e}")
+            logger.error("Processing error: %s", e)
             raise HTTPException(status_code=500, detail={
                 "error": "processing_error",
                 "message": f"Error processing image: {str(e)}"
             })
-    finally:
-        # Clean up temp file in background if it exists
+    except BaseException:
+        # Background tasks don't run when the handler raises, so clean up now
         if temp_path and os.path.exists(temp_path):
-            background_tasks.add_task(os.unlink, temp_path)
+            os.unlink(temp_path)
+        raise
 
 @app.get("/status")
 async def get_status():
@@ -209,15 +314,32 @@ async def get_status():
     }
 
 @app.get("/verify/{image_hash}")
-async def get_verification(image_hash: str):
+async def get_verification(request: Request, image_hash: str):
     """Get verification result by image hash"""
-    # This would typically query a database for stored results
-    # For now, return a placeholder
-    return JSONResponse(
+    # Results are kept in the client's result cache
+    result = await request.app.state.client.get_result(image_hash)
+    if result is not None:
+        return result_to_response(result)
+    
+    return ORJSONResponse(
         status_code=404,
         content={"detail": f"Verification result for hash {image_hash} not found"}
     )
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("api:app", host="0.0.0.0", port=8000, reload=True)
+    # Auto-reload is for development only and cannot be combined with multiple workers
+    reload = os.getenv('RELOAD', 'false').lower() == 'true'
+    # Workers only share results and anchoring state through Redis, so default to one without it
+    default_workers = (os.cpu_count() or 1) if os.getenv('REDIS_URL') else 1
+    workers = int(os.getenv('WORKERS', default_workers))
+    uvicorn.run(
+        "api:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=reload,
+        workers=None if reload else workers,
+        # Picks uvloop and httptools when installed, falling back to asyncio/h11 (e.g. on Windows)
+        loop="auto",
+        http="auto"
+    )
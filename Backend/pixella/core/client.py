@@ -3,22 +3,22 @@
 Pixella - Main client orchestrating all components
 """
 
-import os
+import asyncio
 import logging
 from datetime import datetime
+from functools import cached_property
 from pathlib import Path
 from typing import Dict, Any, Optional, Tuple
 from PIL import Image
 
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough
-
-from pixella.core.models import ImageMetadata, TamperResult, ZKProof, PixellaResult
+from pixella.core.models import ImageMetadata, TamperResult, ZKProof, PixellaResult, PipelineContext
 from pixella.core.image_processor import ImageProcessor
 from pixella.core.zk_proof import ZKProofGenerator
 from pixella.ai.groq_accelerator import GroqAccelerator
 from pixella.ai.tamper_detector import TamperDetector
 from pixella.blockchain.anchor import BlockchainAnchor
 from pixella.storage.filecoin import FilecoinStorage
+from pixella.storage.cache import ResultCache
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -27,115 +27,104 @@ logger = logging.getLogger(__name__)
 class PixellaClient:
     """Main Pixella client orchestrating all components"""
     
-    def __init__(self):
-        self.groq = GroqAccelerator()
-        self.image_processor = ImageProcessor()
-        self.tamper_detector = TamperDetector(self.groq)
-        self.zk_generator = ZKProofGenerator()
-        self.blockchain = BlockchainAnchor()
-        self.filecoin = FilecoinStorage()
-        
-        # Build LangChain pipeline
-        self.pipeline = self._build_pipeline()
+    # Sub-components below are built lazily on first use
+    
+    @cached_property
+    def groq(self) -> GroqAccelerator:
+        return GroqAccelerator()
+    
+    @cached_property
+    def image_processor(self) -> ImageProcessor:
+        return ImageProcessor()
+    
+    @cached_property
+    def tamper_detector(self) -> TamperDetector:
+        return TamperDetector(self.groq)
+    
+    @cached_property
+    def zk_generator(self) -> ZKProofGenerator:
+        return ZKProofGenerator()
     
-    def _build_pipeline(self):
-        """Build LangChain processing pipeline"""
-        # Create a sequential pipeline where each step passes its output to the next step
-        load_image = RunnableLambda(self._load_image)
+    @cached_property
+    def blockchain(self) -> BlockchainAnchor:
+        return BlockchainAnchor()
+    
+    @cached_property
+    def filecoin(self) -> FilecoinStorage:
+        return FilecoinStorage()
+    
+    @cached_property
+    def result_cache(self) -> ResultCache:
+        return ResultCache()
+    
+    async def _run_pipeline(self, ctx: PipelineContext) -> PipelineContext:
+        """Run the verification pipeline, each step building on the previous one"""
+        await self._load_image(ctx)
         
         # Extract features depends on image_data
-        extract_features = RunnableLambda(self._extract_features)
-        
-        # Detect tampering depends on image_data and features
-        detect_tampering = RunnableLambda(self._detect_tampering)
-        
-        # Generate proof depends on image_data
-        generate_proof = RunnableLambda(self._generate_proof)
+        await self._extract_features(ctx)
         
-        # Commit to blockchain depends on zk_proof and image_data
-        commit_blockchain = RunnableLambda(self._commit_to_blockchain)
+        # Tampering detection and proof generation are independent, run them together
+        await self._analyze_image(ctx)
         
-        # Store on Filecoin depends on zk_proof, tamper_result, and image_data
-        store_filecoin = RunnableLambda(self._store_on_filecoin)
-        
-        # Create final result depends on all previous steps
-        create_result = RunnableLambda(self._create_result)
-        
-        # Build the sequential pipeline
-        return (
-            RunnablePassthrough()
-            | load_image
-            | extract_features
-            | detect_tampering
-            | generate_proof
-            | commit_blockchain
-            | store_filecoin
-            | create_result
-        )
+        # Create result from verification data; anchoring is done separately
+        return await self._create_result(ctx)
     
-    async def _load_image(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+    async def _load_image(self, ctx: PipelineContext) -> PipelineContext:
         """Load and process image"""
-        image_path = inputs.get("image_path")
+        image_path = ctx.image_path
         if not image_path:
-            logger.error("Image path not provided in inputs")
+            logger.error("Image path not provided in pipeline context")
             raise ValueError("Image path not provided")
             
-        logger.info(f"Loading image from path: {image_path}")
-        
-        # Check if file exists
-        if not os.path.exists(image_path):
-            logger.error(f"Image file does not exist: {image_path}")
-            raise FileNotFoundError(f"Image file not found: {image_path}")
-            
-        # Check if file is readable
-        if not os.access(image_path, os.R_OK):
-            logger.error(f"Image file is not readable: {image_path}")
-            raise PermissionError(f"Cannot read image file: {image_path}")
-            
-        # Check file size
-        file_size = os.path.getsize(image_path)
-        logger.info(f"Image file size: {file_size} bytes")
+        logger.info("Loading image from path: %s", image_path)
         
         try:
-            image, metadata = self.image_processor.load_image(image_path)
-            logger.info(f"Successfully loaded image: {metadata.filename}, hash: {metadata.hash}")
-            # Return all inputs plus the new data
-            return {**inputs, "image": image, "metadata": metadata}
+            # Reuses the stat from process_image_sync's validation when present
+            image, pixels, metadata = await asyncio.to_thread(
+                self.image_processor.load_image, image_path, ctx.image_hash, ctx.file_stat
+            )
+            logger.info("Image file size: %s bytes", metadata.size)
+            logger.info("Successfully loaded image: %s, hash: %s", metadata.filename, metadata.hash)
+            # Record the new data on the shared context
+            ctx.image, ctx.pixels, ctx.metadata = image, pixels, metadata
+            return ctx
         except Exception as e:
-            logger.error(f"Failed to load image: {str(e)}")
+            logger.error("Failed to load image: %s", e)
             raise ValueError(f"Image not loaded: {str(e)}")
     
-    async def _extract_features(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+    async def _extract_features(self, ctx: PipelineContext) -> PipelineContext:
         """Extract features from image"""
         logger.info("Starting feature extraction")
         
-        # In sequential pipeline, inputs should contain image and metadata from previous step
-        image = inputs.get("image")
-        metadata = inputs.get("metadata")
+        # In sequential pipeline, ctx should contain pixels and metadata from previous step
+        pixels = ctx.pixels
+        metadata = ctx.metadata
         
-        if image is None:
-            logger.error("No image object available for feature extraction")
+        if pixels is None:
+            logger.error("No pixel array available for feature extraction")
             raise ValueError("Image not available for feature extraction")
             
         if metadata is None:
             logger.error("No metadata available for feature extraction")
             raise ValueError("Metadata not available for feature extraction")
             
-        logger.info(f"Extracting features for image: {metadata.filename}")
-        features = self.image_processor.extract_features(image)
-        logger.info(f"Feature extraction complete, extracted {len(features) if features is not None else 0} features")
+        logger.info("Extracting features for image: %s", metadata.filename)
+        features = await asyncio.to_thread(self.image_processor.extract_features, pixels)
+        logger.info("Feature extraction complete, extracted %s features", len(features) if features is not None else 0)
         
-        # Pass through all inputs and add features
-        return {**inputs, "features": features}
+        # Record features on the shared context
+        ctx.features = features
+        return ctx
     
-    async def _detect_tampering(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+    async def _detect_tampering(self, ctx: PipelineContext) -> PipelineContext:
         """Detect image tampering"""
         logger.info("Starting tampering detection")
         
-        # In sequential pipeline, inputs should contain image, metadata, and features from previous steps
-        image = inputs.get("image")
-        metadata = inputs.get("metadata")
-        features = inputs.get("features")
+        # In sequential pipeline, ctx should contain image, metadata, and features from previous steps
+        image = ctx.image
+        metadata = ctx.metadata
+        features = ctx.features
         
         if image is None:
             logger.error("No image object available for tampering detection")
@@ -149,91 +138,125 @@ class PixellaClient:
             logger.error("No metadata available for tampering detection")
             raise ValueError("Metadata not available for tampering detection")
             
-        logger.info(f"Detecting tampering for image: {metadata.filename}")
+        logger.info("Detecting tampering for image: %s", metadata.filename)
         tamper_result = await self.tamper_detector.detect_tampering(image, features)
-        logger.info(f"Tampering detection complete: is_tampered={tamper_result.is_tampered}, score={tamper_result.tamper_score}")
+        logger.info("Tampering detection complete: is_tampered=%s, score=%s", tamper_result.is_tampered, tamper_result.tamper_score)
         
-        # Pass through all inputs and add tamper_result
-        return {**inputs, "tamper_result": tamper_result}
+        # Record tamper_result on the shared context
+        ctx.tamper_result = tamper_result
+        return ctx
     
-    async def _generate_proof(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+    async def _generate_proof(self, ctx: PipelineContext) -> PipelineContext:
         """Generate ZK proof"""
         logger.info("Starting ZK proof generation")
         
-        # In sequential pipeline, inputs should contain metadata from previous steps
-        metadata = inputs.get("metadata")
+        # In sequential pipeline, ctx should contain metadata from previous steps
+        metadata = ctx.metadata
         
         if metadata is None:
             logger.error("No metadata available for ZK proof generation")
             raise ValueError("Image metadata not available")
         
         image_hash = metadata.hash
-        logger.info(f"Generating ZK proof for image hash: {image_hash}")
+        logger.info("Generating ZK proof for image hash: %s", image_hash)
         
         try:
             zk_proof = await self.zk_generator.generate_proof(image_hash, metadata)
-            logger.info(f"ZK proof generation complete: circuit_hash={zk_proof.circuit_hash}")
-            # Pass through all inputs and add zk_proof
-            return {**inputs, "zk_proof": zk_proof}
+            logger.info("ZK proof generation complete: circuit_hash=%s", zk_proof.circuit_hash)
+            # Record zk_proof on the shared context
+            ctx.zk_proof = zk_proof
+            return ctx
         except Exception as e:
-            logger.error(f"Failed to generate ZK proof: {str(e)}")
+            logger.error("Failed to generate ZK proof: %s", e)
+            raise
+    
+    async def _run_concurrently(self, *coros) -> None:
+        """Run pipeline stages concurrently, cancelling the rest as soon as one fails"""
+        # Unlike TaskGroup this re-raises the stage's own exception, not an ExceptionGroup
+        tasks = [asyncio.ensure_future(coro) for coro in coros]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            # Let cancelled stages unwind before the error propagates
+            await asyncio.gather(*tasks, return_exceptions=True)
             raise
     
-    async def _commit_to_blockchain(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+    async def _analyze_image(self, ctx: PipelineContext) -> PipelineContext:
+        """Detect tampering and generate ZK proof concurrently"""
+        # Each stage fills in its own field on the shared context
+        await self._run_concurrently(
+            self._detect_tampering(ctx),
+            self._generate_proof(ctx)
+        )
+        return ctx
+    
+    async def _anchor_proof(self, ctx: PipelineContext) -> PipelineContext:
+        """Commit proof to blockchain and store it on Filecoin concurrently"""
+        # Each stage fills in its own field on the shared context
+        await self._run_concurrently(
+            self._commit_to_blockchain(ctx),
+            self._store_on_filecoin(ctx)
+        )
+        return ctx
+    
+    async def _commit_to_blockchain(self, ctx: PipelineContext) -> PipelineContext:
         """Commit proof to blockchain"""
         logger.info("Starting blockchain commit")
         
-        # In sequential pipeline, inputs should contain zk_proof and metadata from previous steps
-        zk_proof = inputs.get("zk_proof")
-        metadata = inputs.get("metadata")
+        # In sequential pipeline, ctx should contain zk_proof and metadata from previous steps
+        zk_proof = ctx.zk_proof
+        metadata = ctx.metadata
         
         if zk_proof is None:
             logger.warning("No ZK proof available for blockchain commit, skipping")
-            # Still pass through all inputs even if we skip this step
-            return {**inputs, "blockchain_tx": None}
+            ctx.blockchain_tx = None
+            return ctx
             
         if metadata is None:
             logger.warning("No metadata available for blockchain commit, skipping")
-            # Still pass through all inputs even if we skip this step
-            return {**inputs, "blockchain_tx": None}
+            ctx.blockchain_tx = None
+            return ctx
         
-        logger.info(f"Committing proof to blockchain for image hash: {metadata.hash}")
+        logger.info("Committing proof to blockchain for image hash: %s", metadata.hash)
         try:
             tx_hash = await self.blockchain.commit_proof(zk_proof, metadata.hash)
-            logger.info(f"Blockchain commit complete: tx_hash={tx_hash}")
-            # Pass through all inputs and add blockchain_tx
-            return {**inputs, "blockchain_tx": tx_hash}
+            logger.info("Blockchain commit complete: tx_hash=%s", tx_hash)
+            # Record blockchain_tx on the shared context
+            ctx.blockchain_tx = tx_hash
+            return ctx
         except Exception as e:
-            logger.error(f"Failed to commit to blockchain: {str(e)}")
-            # Don't raise exception, just return None to continue pipeline
-            # Still pass through all inputs
-            return {**inputs, "blockchain_tx": None}
+            logger.error("Failed to commit to blockchain: %s", e)
+            # Don't raise exception, just record None to continue pipeline
+            ctx.blockchain_tx = None
+            return ctx
     
-    async def _store_on_filecoin(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+    async def _store_on_filecoin(self, ctx: PipelineContext) -> PipelineContext:
         """Store proof on Filecoin"""
         logger.info("Starting Filecoin storage")
         
-        # In sequential pipeline, inputs should contain zk_proof, tamper_result, and metadata from previous steps
-        zk_proof = inputs.get("zk_proof")
-        tamper_result = inputs.get("tamper_result")
-        metadata = inputs.get("metadata")
+        # In sequential pipeline, ctx should contain zk_proof, tamper_result, and metadata from previous steps
+        zk_proof = ctx.zk_proof
+        tamper_result = ctx.tamper_result
+        metadata = ctx.metadata
         
         if zk_proof is None:
             logger.warning("No ZK proof available for Filecoin storage, skipping")
-            # Still pass through all inputs even if we skip this step
-            return {**inputs, "filecoin_data": None}
+            ctx.filecoin_data = None
+            return ctx
             
         if tamper_result is None:
             logger.warning("No tamper result available for Filecoin storage, skipping")
-            # Still pass through all inputs even if we skip this step
-            return {**inputs, "filecoin_data": None}
+            ctx.filecoin_data = None
+            return ctx
             
         if metadata is None:
             logger.warning("No metadata available for Filecoin storage, skipping")
-            # Still pass through all inputs even if we skip this step
-            return {**inputs, "filecoin_data": None}
+            ctx.filecoin_data = None
+            return ctx
         
-        logger.info(f"Storing proof on Filecoin for image hash: {metadata.hash}")
+        logger.info("Storing proof on Filecoin for image hash: %s", metadata.hash)
         
         proof_data = {
             "image_hash": metadata.hash,
@@ -252,28 +275,26 @@ class PixellaClient:
         
         try:
             filecoin_data = await self.filecoin.store_proof(proof_data, metadata.hash)
-            logger.info(f"Filecoin storage complete: cid={filecoin_data.get('cid')}, deal_id={filecoin_data.get('deal_id')}")
-            # Pass through all inputs and add filecoin_data
-            return {**inputs, "filecoin_data": filecoin_data}
+            logger.info("Filecoin storage complete: cid=%s, deal_id=%s", filecoin_data.get('cid'), filecoin_data.get('deal_id'))
+            # Record filecoin_data on the shared context
+            ctx.filecoin_data = filecoin_data
+            return ctx
         except Exception as e:
-            logger.error(f"Failed to store on Filecoin: {str(e)}")
-            # Don't raise exception, just return None to continue pipeline
-            # Still pass through all inputs
-            return {**inputs, "filecoin_data": None}
+            logger.error("Failed to store on Filecoin: %s", e)
+            # Don't raise exception, just record None to continue pipeline
+            ctx.filecoin_data = None
+            return ctx
     
-    async def _create_result(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+    async def _create_result(self, ctx: PipelineContext) -> PipelineContext:
         """Create final result"""
         logger.info("Creating final result")
         
-        # Log available inputs for debugging
-        logger.debug(f"Available inputs keys: {list(inputs.keys())}")
-        
-        # In sequential pipeline, inputs should contain all data from previous steps
-        metadata = inputs.get("metadata")
-        tamper_result = inputs.get("tamper_result")
-        zk_proof = inputs.get("zk_proof")
-        blockchain_tx = inputs.get("blockchain_tx")
-        filecoin_data = inputs.get("filecoin_data")
+        # In sequential pipeline, ctx should contain all data from previous steps
+        metadata = ctx.metadata
+        tamper_result = ctx.tamper_result
+        zk_proof = ctx.zk_proof
+        blockchain_tx = ctx.blockchain_tx
+        filecoin_data = ctx.filecoin_data
         
         # Check required data
         if metadata is None:
@@ -284,7 +305,7 @@ class PixellaClient:
             logger.error("No tamper result available for result creation")
             raise ValueError("Tamper result not available")
         
-        logger.info(f"Creating result for image hash: {metadata.hash}")
+        logger.info("Creating result for image hash: %s", metadata.hash)
         verification_url = f"https://verify.pixella.ai/{metadata.hash}"
         
         # Extract Filecoin CID and deal ID if available
@@ -293,9 +314,9 @@ class PixellaClient:
         if filecoin_data:
             filecoin_cid = filecoin_data.get("cid")
             filecoin_deal_id = filecoin_data.get("deal_id")
-            logger.info(f"Filecoin data included: cid={filecoin_cid}, deal_id={filecoin_deal_id}")
+            logger.info("Filecoin data included: cid=%s, deal_id=%s", filecoin_cid, filecoin_deal_id)
         else:
-            logger.warning("No Filecoin data available for result")
+            logger.info("No Filecoin data available for result")
             
         # Create result object
         try:
@@ -310,19 +331,78 @@ class PixellaClient:
                 filecoin_cid=filecoin_cid,
                 filecoin_deal_id=filecoin_deal_id
             )
-            logger.info(f"Result created successfully for image: {metadata.filename}")
-            # Return only the result in the final step
-            return {"result": result}
+            logger.info("Result created successfully for image: %s", metadata.filename)
+            ctx.result = result
+            return ctx
         except Exception as e:
-            logger.error(f"Failed to create result: {str(e)}")
+            logger.error("Failed to create result: %s", e)
             raise
     
-    async def process_image(self, image_path: str) -> PixellaResult:
-        """Process image and generate authenticity proof"""
+    async def process_image_sync(self, image_path: str) -> PixellaResult:
+        """Verify image and generate proof, without anchoring it on-chain or on Filecoin"""
         try:
-            inputs = {"image_path": image_path}
-            result = await self.pipeline.ainvoke(inputs)
-            return result["result"]
+            # Reject unsupported or oversized files before the cache can short-circuit validation
+            path = Path(image_path)
+            file_stat = self.image_processor.validate_file(path)
+            
+            # Identical file bytes always produce the same result, so check the cache first
+            image_hash = await asyncio.to_thread(self.image_processor.hash_file, path)
+            cached = await self.result_cache.get(image_hash)
+            if cached is not None:
+                logger.info("Returning cached result for image hash: %s", image_hash)
+                return cached
+            
+            ctx = PipelineContext(image_path=image_path, image_hash=image_hash, file_stat=file_stat)
+            ctx = await self._run_pipeline(ctx)
+            await self.result_cache.set(image_hash, ctx.result)
+            return ctx.result
         except Exception as e:
-            logger.error(f"Image processing error: {e}")
+            logger.error("Image processing error: %s", e)
             raise
+    
+    async def process_image_anchor(self, result: PixellaResult) -> PixellaResult:
+        """Commit a verified result's proof to blockchain and Filecoin, updating it in place"""
+        image_hash = result.image_hash
+        
+        # Skip results that are already anchored or being anchored by any worker
+        if result.is_anchored or not await self.result_cache.claim_anchor(image_hash):
+            logger.info("Proof for image hash %s already anchored, skipping", image_hash)
+            return result
+        
+        try:
+            # This copy may be stale if another worker finished anchoring since it was cached
+            latest = await self.result_cache.get(image_hash, refresh=True)
+            if latest is not None and latest.is_anchored:
+                logger.info("Proof for image hash %s already anchored, skipping", image_hash)
+                result.blockchain_tx = latest.blockchain_tx
+                result.filecoin_cid = latest.filecoin_cid
+                result.filecoin_deal_id = latest.filecoin_deal_id
+                return result
+            
+            ctx = PipelineContext(
+                image_hash=image_hash,
+                metadata=result.metadata,
+                tamper_result=result.tamper_result,
+                zk_proof=result.zk_proof
+            )
+            await self._anchor_proof(ctx)
+            
+            result.blockchain_tx = ctx.blockchain_tx
+            if ctx.filecoin_data:
+                result.filecoin_cid = ctx.filecoin_data.get("cid")
+                result.filecoin_deal_id = ctx.filecoin_data.get("deal_id")
+            
+            # Store the anchored result so lookups by hash see the tx and CID
+            await self.result_cache.set(image_hash, result)
+            return result
+        finally:
+            await self.result_cache.release_anchor(image_hash)
+    
+    async def process_image(self, image_path: str) -> PixellaResult:
+        """Process image and generate authenticity proof"""
+        result = await self.process_image_sync(image_path)
+        return await self.process_image_anchor(result)
+    
+    async def get_result(self, image_hash: str) -> Optional[PixellaResult]:
+        """Get a previously computed result by image hash"""
+        return await self.result_cache.get(image_hash)
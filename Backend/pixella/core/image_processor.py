@@ -10,13 +10,32 @@ import numpy as np
 from PIL import Image
 from pathlib import Path
 from datetime import datetime
-from Crypto.Hash import SHA256
+from typing import Optional
 
 from pixella.core.models import ImageMetadata
 
+try:
+    import cv2
+except ImportError:  # For testing environments without cv2
+    cv2 = None
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+except ImportError:  # libjpeg-turbo bindings are an optional accelerator
+    TurboJPEG = None
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Extensions decoded through libjpeg-turbo when available
+JPEG_EXTENSIONS = ('jpg', 'jpeg')
+
+# Read size used when streaming files through the hasher
+HASH_CHUNK_SIZE = 1 << 20
+
+# Bytes per ORB binary descriptor
+ORB_DESCRIPTOR_SIZE = 32
+
 
 class ImageProcessor:
     """Core image processing utilities"""
@@ -24,80 +43,141 @@ class ImageProcessor:
     def __init__(self):
         self.supported_formats = os.getenv('SUPPORTED_FORMATS', 'jpg,jpeg,png,bmp,webp').split(',')
         self.max_size = int(os.getenv('MAX_IMAGE_SIZE', 10485760))
-    
-    def load_image(self, image_path: str) -> tuple[Image.Image, ImageMetadata]:
-        """Load and validate image"""
-        path = Path(image_path)
+        self.max_pixels = int(os.getenv('MAX_IMAGE_PIXELS', 50000000))
+        self.orb_features = int(os.getenv('ORB_FEATURES', 500))
         
-        if not path.exists():
-            raise FileNotFoundError(f"Image not found: {image_path}")
+        # ORB detector is reused across calls
+        self._orb = cv2.ORB_create(nfeatures=self.orb_features) if cv2 is not None else None
         
-        # Debug logging for format detection
+        # JPEG fast path needs the libturbojpeg shared library as well as the bindings
+        self._turbojpeg = None
+        if TurboJPEG is not None:
+            try:
+                self._turbojpeg = TurboJPEG()
+            except (OSError, RuntimeError) as e:
+                logger.warning("libjpeg-turbo not available, using Pillow for JPEG: %s", e)
+    
+    def load_image(
+        self,
+        image_path: str,
+        image_hash: Optional[str] = None,
+        file_stat: Optional[os.stat_result] = None
+    ) -> tuple[Image.Image, np.ndarray, ImageMetadata]:
+        """Load and validate image, returning the RGB image, its uint8 pixel array and metadata"""
+        path = Path(image_path)
+        # A stat result passed in means the caller already ran validate_file
+        if file_stat is None:
+            file_stat = self.validate_file(path)
         extension = path.suffix.lower().lstrip('.')
-        logger.info(f"File extension: '{extension}', Supported formats: {self.supported_formats}")
         
-        if extension not in self.supported_formats:
-            raise ValueError(f"Unsupported format: {path.suffix}")
+        # Hash the encoded file bytes before decoding
+        if image_hash is None:
+            image_hash = self.hash_file(path)
         
-        if path.stat().st_size > self.max_size:
-            raise ValueError(f"Image too large: {path.stat().st_size} bytes")
+        # Check the header before paying for a full decode
+        image_format = self.verify_image(path)
         
         # Load image
-        image = Image.open(path).convert('RGB')
+        image, pixels = self.decode_image(path, extension)
         
         # Extract metadata
         metadata = ImageMetadata(
             filename=path.name,
-            size=path.stat().st_size,
+            size=file_stat.st_size,
             dimensions=image.size,
-            format=image.format or path.suffix.upper().lstrip('.'),
+            format=image_format or path.suffix.upper().lstrip('.'),
             timestamp=datetime.now().isoformat(),
-            hash=self.hash_image(image)
+            hash=image_hash
         )
         
-        return image, metadata
+        return image, pixels, metadata
     
-    def hash_image(self, image: Image.Image) -> str:
-        """Generate cryptographic hash of image"""
-        # Convert to bytes
-        img_bytes = np.array(image).tobytes()
+    def validate_file(self, path: Path, file_stat: Optional[os.stat_result] = None) -> os.stat_result:
+        """Check file existence, extension and size, returning its stat result"""
+        # Reuse the caller's stat result when available
+        if file_stat is None:
+            try:
+                file_stat = path.stat()
+            except FileNotFoundError:
+                raise FileNotFoundError(f"Image not found: {path}")
         
-        # Create SHA256 hash
-        hash_obj = SHA256.new()
-        hash_obj.update(img_bytes)
+        # Debug logging for format detection
+        extension = path.suffix.lower().lstrip('.')
+        logger.info("File extension: '%s', Supported formats: %s", extension, self.supported_formats)
         
-        return hash_obj.hexdigest()
+        if extension not in self.supported_formats:
+            raise ValueError(f"Unsupported format: {path.suffix}")
+        
+        if file_stat.st_size > self.max_size:
+            raise ValueError(f"Image too large: {file_stat.st_size} bytes")
+        
+        return file_stat
     
-    def extract_features(self, image: Image.Image) -> np.ndarray:
-        """Extract image features for analysis"""
+    def verify_image(self, path: Path) -> Optional[str]:
+        """Validate image header and dimensions without decoding pixel data, returning the format"""
         try:
-            import cv2  # Import here to avoid circular imports
-            
-            # Convert PIL image to numpy array
-            img_array = np.array(image)
-            
-            # Convert to grayscale if needed
-            if len(img_array.shape) == 3 and img_array.shape[2] == 3:
-                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-            else:
-                gray = img_array
-                
-            # Extract features using ORB (Oriented FAST and Rotated BRIEF)
-            orb = cv2.ORB_create()
-            keypoints, descriptors = orb.detectAndCompute(gray, None)
-            
-            # If no features found, return empty array
-            if descriptors is None:
-                return np.array([])
-                
-            # Flatten and normalize features
-            features = descriptors.flatten()
-            if len(features) > 0:
-                features = features / np.linalg.norm(features)
-                
-            return features
-        except ImportError:
+            with Image.open(path) as im:
+                width, height = im.size
+                image_format = im.format
+                im.verify()
+        except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+            raise ValueError(f"Invalid image file: {e}")
+        
+        if width * height > self.max_pixels:
+            raise ValueError(f"Image dimensions too large: {width}x{height} pixels")
+        
+        return image_format
+    
+    def decode_image(self, path: Path, extension: str) -> tuple[Image.Image, np.ndarray]:
+        """Decode image to RGB image and pixel array, using libjpeg-turbo for JPEG files when available"""
+        if self._turbojpeg is not None and extension in JPEG_EXTENSIONS:
+            try:
+                with open(path, 'rb') as f:
+                    pixels = self._turbojpeg.decode(f.read(), pixel_format=TJPF_RGB)
+                return Image.fromarray(pixels), np.ascontiguousarray(pixels)
+            except (OSError, ValueError) as e:
+                # Not a baseline JPEG libjpeg-turbo can handle; let Pillow try
+                logger.warning("libjpeg-turbo decode failed, falling back to Pillow: %s", e)
+        
+        image = Image.open(path).convert('RGB')
+        return image, np.asarray(image)
+    
+    def hash_file(self, path: Path) -> str:
+        """Generate cryptographic hash of the raw file bytes"""
+        hash_obj = hashlib.sha256()
+        buffer = bytearray(HASH_CHUNK_SIZE)
+        view = memoryview(buffer)
+        
+        # Stream the file through a reusable buffer
+        with open(path, 'rb') as f:
+            while True:
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                hash_obj.update(view[:n])
+        
+        return hash_obj.hexdigest()
+    
+    def extract_features(self, pixels: np.ndarray) -> np.ndarray:
+        """Extract image features for analysis as an (N, 32) uint8 ORB descriptor matrix"""
+        if cv2 is None:
             # For testing environments without cv2
             logger.warning("OpenCV (cv2) not available, using mock features")
-            # Return mock features for testing
-            return np.random.rand(2048)
+            # Return mock ORB-shaped descriptors for testing
+            return np.random.randint(0, 256, size=(64, ORB_DESCRIPTOR_SIZE), dtype=np.uint8)
+        
+        # Convert to grayscale if needed
+        if pixels.ndim == 3 and pixels.shape[2] == 3:
+            gray = cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY)
+        else:
+            gray = pixels
+            
+        # Extract features using ORB (Oriented FAST and Rotated BRIEF)
+        keypoints, descriptors = self._orb.detectAndCompute(gray, None)
+        
+        # If no features found, return empty descriptor matrix
+        if descriptors is None:
+            return np.empty((0, ORB_DESCRIPTOR_SIZE), dtype=np.uint8)
+            
+        # ORB descriptors are binary, so keep the (N, 32) uint8 matrix as-is
+        return descriptors
@@ -3,10 +3,14 @@
 Pixella - Core data models
 """
 
+import os
 from dataclasses import dataclass, asdict
 from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
 
+import numpy as np
+from PIL import Image
+
 
 @dataclass
 class ImageMetadata:
@@ -53,3 +57,25 @@ class PixellaResult:
     blockchain_tx: Optional[str] = None
     filecoin_cid: Optional[str] = None
     filecoin_deal_id: Optional[str] = None
+
+    @property
+    def is_anchored(self) -> bool:
+        """Whether the proof has been committed on-chain or stored on Filecoin"""
+        return bool(self.blockchain_tx or self.filecoin_cid)
+
+
+@dataclass
+class PipelineContext:
+    """Mutable state shared by all pipeline stages for one image"""
+    image_path: Optional[str] = None
+    image_hash: Optional[str] = None
+    file_stat: Optional[os.stat_result] = None
+    image: Optional[Image.Image] = None
+    pixels: Optional[np.ndarray] = None
+    metadata: Optional[ImageMetadata] = None
+    features: Optional[np.ndarray] = None
+    tamper_result: Optional[TamperResult] = None
+    zk_proof: Optional[ZKProof] = None
+    blockchain_tx: Optional[str] = None
+    filecoin_data: Optional[Dict[str, Any]] = None
+    result: Optional[PixellaResult] = None
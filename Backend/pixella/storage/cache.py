@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Pixella - Verification result cache keyed by image hash
+"""
+
+import os
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import Dict, Any, Optional, Set, Tuple
+
+import orjson
+
+from pixella.core.models import ImageMetadata, TamperResult, ZKProof, PixellaResult
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis is optional, the in-process cache still works
+    aioredis = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def _result_from_dict(data: Dict[str, Any]) -> PixellaResult:
+    """Rebuild a PixellaResult from its asdict() form"""
+    metadata = dict(data["metadata"])
+    metadata["dimensions"] = tuple(metadata["dimensions"])
+    zk_proof = data.get("zk_proof")
+    return PixellaResult(**{
+        **data,
+        "metadata": ImageMetadata(**metadata),
+        "tamper_result": TamperResult(**data["tamper_result"]),
+        "zk_proof": ZKProof(**zk_proof) if zk_proof else None
+    })
+
+
+class ResultCache:
+    """Two-level cache: in-process LRU in front of an optional Redis shared by all workers"""
+
+    def __init__(self):
+        self.ttl = int(os.getenv('RESULT_CACHE_TTL', 86400))
+        self.max_entries = int(os.getenv('RESULT_CACHE_SIZE', 1024))
+        self.local_ttl = int(os.getenv('RESULT_CACHE_LOCAL_TTL', 30))
+        self.anchor_lock_ttl = int(os.getenv('ANCHOR_LOCK_TTL', 600))
+        self.key_prefix = "pixella:verify:"
+        self.anchor_prefix = "pixella:anchoring:"
+        # Entries map image hash to (result, monotonic expiry or None)
+        self._local: "OrderedDict[str, Tuple[PixellaResult, Optional[float]]]" = OrderedDict()
+        # Image hashes being anchored, used only when there is no shared store
+        self._anchoring: Set[str] = set()
+
+        self._redis = None
+        redis_url = os.getenv('REDIS_URL')
+        if redis_url:
+            if aioredis is None:
+                logger.warning("REDIS_URL is set but redis is not installed, using in-process cache only")
+            else:
+                self._redis = aioredis.from_url(redis_url)
+
+    def _remember(self, image_hash: str, result: PixellaResult) -> None:
+        """Insert into the in-process LRU, evicting the oldest entry if full"""
+        # Another worker may still anchor this result, so only keep un-anchored copies briefly
+        expires_at = None
+        if self._redis is not None and not result.is_anchored:
+            expires_at = time.monotonic() + self.local_ttl
+
+        self._local[image_hash] = (result, expires_at)
+        self._local.move_to_end(image_hash)
+        if len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    async def get(self, image_hash: str, refresh: bool = False) -> Optional[PixellaResult]:
+        """Return the cached result for an image hash, skipping the local copy on refresh when Redis is configured"""
+        if not (refresh and self._redis is not None):
+            entry = self._local.get(image_hash)
+            if entry is not None:
+                result, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._local.move_to_end(image_hash)
+                    return result
+                del self._local[image_hash]
+
+        if self._redis is None:
+            return None
+
+        try:
+            cached = await self._redis.get(self.key_prefix + image_hash)
+        except Exception as e:
+            logger.warning("Redis cache lookup failed: %s", e)
+            return None
+
+        if cached is None:
+            return None
+
+        try:
+            result = _result_from_dict(orjson.loads(cached))
+        except (orjson.JSONDecodeError, TypeError, KeyError, ValueError) as e:
+            # Written by an incompatible version or corrupted; drop it and recompute
+            logger.warning("Discarding unreadable cached result for %s: %s", image_hash, e)
+            try:
+                await self._redis.delete(self.key_prefix + image_hash)
+            except Exception as e:
+                logger.warning("Redis cache delete failed: %s", e)
+            return None
+
+        self._remember(image_hash, result)
+        return result
+
+    async def set(self, image_hash: str, result: PixellaResult) -> None:
+        """Cache a result for an image hash"""
+        self._remember(image_hash, result)
+
+        if self._redis is None:
+            return
+
+        try:
+            await self._redis.setex(
+                self.key_prefix + image_hash,
+                self.ttl,
+                orjson.dumps(asdict(result), option=orjson.OPT_SERIALIZE_NUMPY)
+            )
+        except Exception as e:
+            logger.warning("Redis cache store failed: %s", e)
+
+    async def claim_anchor(self, image_hash: str) -> bool:
+        """Mark an image hash as being anchored, returning False if it already is"""
+        if self._redis is None:
+            if image_hash in self._anchoring:
+                return False
+            self._anchoring.add(image_hash)
+            return True
+
+        try:
+            claimed = await self._redis.set(
+                self.anchor_prefix + image_hash, b"1", nx=True, ex=self.anchor_lock_ttl
+            )
+        except Exception as e:
+            # Without the shared marker another worker could anchor too, so skip this time
+            logger.warning("Redis anchor claim failed: %s", e)
+            return False
+        return bool(claimed)
+
+    async def release_anchor(self, image_hash: str) -> None:
+        """Clear the anchoring marker for an image hash"""
+        if self._redis is None:
+            self._anchoring.discard(image_hash)
+            return
+
+        try:
+            await self._redis.delete(self.anchor_prefix + image_hash)
+        except Exception as e:
+            # The marker expires on its own after anchor_lock_ttl
+            logger.warning("Redis anchor release failed: %s", e)